@@ -148,11 +148,12 @@ async def search_users(keywords: str, start: int, limit: int,
     # 2. do searching
     index = -1
     users = []
+    found = set()  # same as users, for checking duplicated
     all_documents = await database.scan_documents()
     for doc in all_documents:
         # check duplicated
         identifier = DocumentUtils.get_document_id(document=doc)
-        if identifier in users:
+        if identifier in found:
             # already exists
             continue
         # get user info
@@ -185,6 +186,7 @@ async def search_users(keywords: str, start: int, limit: int,
             break
         # got it
         users.append(identifier)
+        found.add(identifier)
     # 3. cache the search result
     g_search_cache.update(key=(keywords, start, end), value=users, life_span=600, now=now)
     return users
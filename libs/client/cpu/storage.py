@@ -30,10 +30,11 @@
     storage protocol: post/get contacts, private_key, ...
 """
 
-from typing import List
+from typing import Optional, List
 
-from dimples import ReliableMessage
+from dimples import Envelope, ReliableMessage
 from dimples import Content
+from dimples import Facebook, Messenger
 from dimples import BaseCommandProcessor
 
 from ...common.protocol import StorageCommand
@@ -41,8 +42,22 @@ from ...common import CommonFacebook
 from ...database import Database
 
 
+_TPL_NOT_FOUND = 'Contacts not found: ${did}.'
+_TPL_RECEIVED = 'Contacts received: ${did}.'
+_TPL_NOT_CHANGED = 'Contacts not changed: ${did}.'
+_TPL_UNSUPPORTED = 'Storage command (title: ${title}) not support yet!'
+
+
 class StorageCommandProcessor(BaseCommandProcessor):
 
+    def __init__(self, facebook: Facebook, messenger: Messenger):
+        super().__init__(facebook=facebook, messenger=messenger)
+        self.__database: Optional[Database] = None
+        # title => handler
+        self._handlers = {
+            StorageCommand.CONTACTS: self._handle_contacts,
+        }
+
     @property
     def facebook(self) -> CommonFacebook:
         barrack = super().facebook
@@ -51,55 +66,49 @@ class StorageCommandProcessor(BaseCommandProcessor):
 
     @property
     def database(self) -> Database:
-        db = self.facebook.barrack.database
-        assert isinstance(db, Database), f'database error: {db}'
+        db = self.__database
+        if db is None:
+            # the database will not change during the processor's lifetime
+            db = self.facebook.barrack.database
+            assert isinstance(db, Database), f'database error: {db}'
+            self.__database = db
         return db
 
+    def _receipt(self, text: str, template: str, content: Content, envelope: Envelope,
+                 **replacements) -> List[Content]:
+        return self._respond_receipt(text=text, content=content, envelope=envelope, extra={
+            'template': template,
+            'replacements': replacements,
+        })
+
     # Override
     async def process_content(self, content: Content, r_msg: ReliableMessage) -> List[Content]:
         assert isinstance(content, StorageCommand), f'command error: {content}'
+        handler = self._handlers.get(content.title, self._handle_unsupported)
+        return await handler(content, r_msg)
+
+    async def _handle_contacts(self, content: StorageCommand, r_msg: ReliableMessage) -> List[Content]:
         sender = r_msg.sender
-        title = content.title
-        if title == StorageCommand.CONTACTS:
-            db = self.database
-            if content.data is None and 'contacts' not in content:
-                # query contacts, load it
-                stored = await db.get_contacts_command(user=sender)
-                # response
-                if stored is None:
-                    text = 'Contacts not found.'
-                    return self._respond_receipt(text=text, content=content, envelope=r_msg.envelope, extra={
-                        'template': 'Contacts not found: ${did}.',
-                        'replacements': {
-                            'did': str(sender),
-                        }
-                    })
-                else:
-                    # response the stored contacts command directly
-                    return [stored]
+        db = self.database
+        if content.data is None and 'contacts' not in content:
+            # query contacts, load it
+            stored = await db.get_contacts_command(user=sender)
+            # response
+            if stored is None:
+                return self._receipt(text='Contacts not found.', template=_TPL_NOT_FOUND,
+                                     content=content, envelope=r_msg.envelope, did=str(sender))
             else:
-                # upload contacts, save it
-                if await db.save_contacts_command(content=content, user=sender):
-                    text = 'Contacts received.'
-                    return self._respond_receipt(text=text, content=content, envelope=r_msg.envelope, extra={
-                        'template': 'Contacts received: ${did}.',
-                        'replacements': {
-                            'did': str(sender),
-                        }
-                    })
-                else:
-                    text = 'Contacts not changed.'
-                    return self._respond_receipt(text=text, content=content, envelope=r_msg.envelope, extra={
-                        'template': 'Contacts not changed: ${did}.',
-                        'replacements': {
-                            'did': str(sender),
-                        }
-                    })
+                # response the stored contacts command directly
+                return [stored]
         else:
-            text = 'Command not support.'
-            return self._respond_receipt(text=text, content=content, envelope=r_msg.envelope, extra={
-                'template': 'Storage command (title: ${title}) not support yet!',
-                'replacements': {
-                    'title': title,
-                }
-            })
+            # upload contacts, save it
+            if await db.save_contacts_command(content=content, user=sender):
+                return self._receipt(text='Contacts received.', template=_TPL_RECEIVED,
+                                     content=content, envelope=r_msg.envelope, did=str(sender))
+            else:
+                return self._receipt(text='Contacts not changed.', template=_TPL_NOT_CHANGED,
+                                     content=content, envelope=r_msg.envelope, did=str(sender))
+
+    async def _handle_unsupported(self, content: StorageCommand, r_msg: ReliableMessage) -> List[Content]:
+        return self._receipt(text='Command not support.', template=_TPL_UNSUPPORTED,
+                             content=content, envelope=r_msg.envelope, title=content.title)
@@ -34,6 +34,7 @@ from dimples.common.dbi import *
 from .dos import *
 from .redis import *
 
+from .writer import DelayedWriter, flush_on_exit
 from .database import Database
 
 
@@ -82,5 +83,6 @@ __all__ = [
     #
     #   Database
     #
+    'DelayedWriter', 'flush_on_exit',
     'Database',
 ]
@@ -29,7 +29,7 @@
 
 """
 
-from typing import Optional, List, Set, Tuple
+from typing import Optional, List, FrozenSet, Tuple
 
 from dimples import SymmetricKey, PrivateKey, SignKey, DecryptKey
 from dimples import ID, Meta, Document, Visa
@@ -254,6 +254,11 @@ class Database(Logging, AccountDBI, MessageDBI, SessionDBI):
     async def save_local_users(self, users: List[ID]) -> bool:
         return await self.__user_table.save_local_users(users=users)
 
+    async def prepare_user(self, user: ID):
+        """ preload contacts & commands of the user when session established """
+        user = user.without_terminal()  # Naked ID
+        await self.__user_table.prepare_user(user=user)
+
     """
         User contacts
         ~~~~~~~~~~~~~
@@ -557,13 +562,13 @@ class Database(Logging, AccountDBI, MessageDBI, SessionDBI):
         """ clear before station start """
         await self.__active_table.clear_socket_addresses()
 
-    async def get_active_users(self) -> Set[ID]:
+    async def get_active_users(self) -> FrozenSet[ID]:
         return await self.__active_table.get_active_users()
 
-    async def add_socket_address(self, user: ID, address: Tuple[str, int]) -> Set[Tuple[str, int]]:
+    async def add_socket_address(self, user: ID, address: Tuple[str, int]) -> FrozenSet[Tuple[str, int]]:
         return await self.__active_table.add_socket_address(user=user, address=address)
 
-    async def remove_socket_address(self, user: ID, address: Tuple[str, int]) -> Set[Tuple[str, int]]:
+    async def remove_socket_address(self, user: ID, address: Tuple[str, int]) -> FrozenSet[Tuple[str, int]]:
         return await self.__active_table.remove_socket_address(user=user, address=address)
 
     #
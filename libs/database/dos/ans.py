@@ -25,6 +25,7 @@
 
 from dimples import ID, ANYONE, EVERYONE, FOUNDER
 
+from dimples.utils import Config
 from dimples.database.dos import Storage
 
 
@@ -42,8 +43,14 @@ class AddressNameStorage(Storage):
         ~~~~~~~~~~~~~~~~~~~~
 
         file path: '.dim/protected/ans.js'
+        file path: '.dim/protected/ans.log'
     """
     ans_path = '{PROTECTED}/ans.js'
+    ans_log_path = '{PROTECTED}/ans.log'  # journal: 'name\tID\n' per line
+
+    def __init__(self, config: Config):
+        super().__init__(config=config)
+        self.__journal_size = 0
 
     def show_info(self):
         path = self.protected_path(self.ans_path)
@@ -52,6 +59,14 @@ class AddressNameStorage(Storage):
     def __ans_path(self) -> str:
         return self.protected_path(self.ans_path)
 
+    def __ans_log_path(self) -> str:
+        return self.protected_path(self.ans_log_path)
+
+    @property
+    def journal_size(self) -> int:
+        """ count of records appended since last full save """
+        return self.__journal_size
+
     async def load_records(self) -> AnsMap:
         path = self.__ans_path()
         self.info('Loading ANS records from: %s' % path)
@@ -67,6 +82,10 @@ class AddressNameStorage(Storage):
                     continue
                 records[name] = uid
         #
+        #  Replay journal
+        #
+        await self.__replay_journal(records=records)
+        #
         #  Reserved names
         #
         records['all'] = EVERYONE
@@ -76,7 +95,38 @@ class AddressNameStorage(Storage):
         records['founder'] = FOUNDER  # 'Albert Moky'
         return records
 
+    async def __replay_journal(self, records: AnsMap):
+        path = self.__ans_log_path()
+        text = await self.read_text(path=path)
+        if text is None:
+            self.__journal_size = 0
+            return
+        count = 0
+        for line in text.splitlines():
+            pair = line.split('\t')
+            if len(pair) != 2:
+                continue
+            uid = ID.parse(identifier=pair[1])
+            if uid is None:
+                self.error(msg='invalid journal record: %s' % line)
+                continue
+            records[pair[0]] = uid
+            count += 1
+        self.__journal_size = count
+        self.info('Replayed %d ANS record(s) from: %s' % (count, path))
+
+    async def append_record(self, name: str, identifier: ID) -> bool:
+        """ append one record into the journal """
+        path = self.__ans_log_path()
+        if await self.append_text(text='%s\t%s\n' % (name, identifier), path=path):
+            self.__journal_size += 1
+            return True
+        else:
+            self.error(msg='failed to append ANS record: %s => %s' % (name, identifier))
+            return False
+
     async def save_records(self, records: AnsMap) -> bool:
+        """ save all records and truncate the journal """
         dictionary = {}
         # revert ID
         for name, uid in records.items():
@@ -86,4 +136,9 @@ class AddressNameStorage(Storage):
                 dictionary[name] = str(uid)
         path = self.__ans_path()
         self.info('Saving %d ANS records into: %s' % (len(records), path))
-        return await self.write_json(container=dictionary, path=path)
+        if not await self.write_json(container=dictionary, path=path):
+            return False
+        # all records saved, clear the journal
+        if await self.write_text(text='', path=self.__ans_log_path()):
+            self.__journal_size = 0
+        return True
@@ -23,10 +23,11 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional
+from typing import Optional, Dict
 
 from dimples import ID, Content, Command
 from dimples import MuteCommand, BlockCommand
+from dimples.utils import Config
 
 from dimples.database.dos.base import template_replace
 from dimples.database import UserStorage as SuperStorage
@@ -34,6 +35,18 @@ from dimples.database import UserStorage as SuperStorage
 
 class UserStorage(SuperStorage):
 
+    def __init__(self, config: Config):
+        super().__init__(config=config)
+        self.__paths: Dict[str, str] = {}  # template => protected path with '{ADDRESS}'
+
+    def __user_path(self, template: str, user: ID) -> str:
+        """ replace '{ADDRESS}' in the protected path, which is resolved only once """
+        path = self.__paths.get(template)
+        if path is None:
+            path = self.protected_path(template)
+            self.__paths[template] = path
+        return template_replace(path, 'ADDRESS', str(user.address))
+
     """
         Contacts Command
         ~~~~~~~~~~~~~~~~
@@ -52,8 +65,7 @@ class UserStorage(SuperStorage):
         print('!!!       mute cmd path: %s' % path5)
 
     def __contacts_command_path(self, user: ID) -> str:
-        path = self.protected_path(self.contacts_command_path)
-        return template_replace(path, 'ADDRESS', str(user.address))
+        return self.__user_path(template=self.contacts_command_path, user=user)
 
     async def save_contacts_command(self, content: Command, user: ID) -> bool:
         assert content is not None, 'contacts command cannot be empty'
@@ -78,8 +90,7 @@ class UserStorage(SuperStorage):
     block_command_path = '{PROTECTED}/{ADDRESS}/block_stored.js'
 
     def __block_command_path(self, user: ID) -> str:
-        path = self.protected_path(self.block_command_path)
-        return template_replace(path, 'ADDRESS', str(user.address))
+        return self.__user_path(template=self.block_command_path, user=user)
 
     async def save_block_command(self, content: BlockCommand, user: ID) -> bool:
         assert content is not None, 'block command cannot be empty'
@@ -104,8 +115,7 @@ class UserStorage(SuperStorage):
     mute_command_path = '{PROTECTED}/{ADDRESS}/mute_stored.js'
 
     def __mute_command_path(self, user: ID) -> str:
-        path = self.protected_path(self.mute_command_path)
-        return template_replace(path, 'ADDRESS', str(user.address))
+        return self.__user_path(template=self.mute_command_path, user=user)
 
     async def save_mute_command(self, content: MuteCommand, user: ID) -> bool:
         assert content is not None, 'mute command cannot be empty'
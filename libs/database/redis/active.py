@@ -23,7 +23,7 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional, Set, Tuple
+from typing import Optional, Set, AbstractSet, Tuple
 
 from dimples import ID
 from dimples import RedisCache
@@ -53,12 +53,10 @@ class ActiveCache(RedisCache):
     async def clear_socket_addresses(self) -> bool:
         """ clear before station start """
         name = self.__active_sockets_cache_name()
-        all_keys = await self.hkeys(name=name)
-        for key in all_keys:
-            await self.hdel(name=name, key=key)
+        # deleting the hash drops all its fields at once
         return await self.delete(name)
 
-    async def save_socket_addresses(self, user: ID, addresses: Set[Tuple[str, int]]) -> bool:
+    async def save_socket_addresses(self, user: ID, addresses: AbstractSet[Tuple[str, int]]) -> bool:
         name = self.__active_sockets_cache_name()
         value = serialize_socket_addresses(addresses=addresses)
         if value is None:
@@ -111,7 +109,7 @@ class ActiveCache(RedisCache):
 """
 
 
-def serialize_socket_addresses(addresses: Set[Tuple[str, int]]) -> Optional[bytes]:
+def serialize_socket_addresses(addresses: AbstractSet[Tuple[str, int]]) -> Optional[bytes]:
     if addresses is None or len(addresses) == 0:
         return None
     array = []
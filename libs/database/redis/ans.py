@@ -24,6 +24,7 @@
 # ==============================================================================
 
 from typing import Optional, Set
+from typing import Mapping
 
 from dimples import utf8_encode, utf8_decode
 from dimples import ID
@@ -55,28 +56,39 @@ class AddressNameCache(RedisCache):
         value = utf8_encode(string=str(identifier))
         return await self.hset(name=self.__cache_name(), key=name, value=value)
 
+    async def save_records(self, records: Mapping[str, ID]) -> bool:
+        """ save all records in one round trip """
+        redis = self.redis
+        if redis is None:
+            return False
+        mapping = {}
+        for name, identifier in records.items():
+            if identifier is not None:
+                mapping[name] = utf8_encode(string=str(identifier))
+        if len(mapping) > 0:
+            redis.hset(name=self.__cache_name(), mapping=mapping)
+        return True
+
     async def get_record(self, name: str) -> Optional[ID]:
         value = await self.hget(name=self.__cache_name(), key=name)
         if value is not None:
             identifier = utf8_decode(data=value)
             return ID.parse(identifier=identifier)
 
-    async def get_names(self, identifier: ID) -> Set[str]:
+    async def get_names(self, identifier: ID) -> Optional[Set[str]]:
         records = await self.hgetall(name=self.__cache_name())
-        if records is None:
-            return set()
+        if records is None or len(records) == 0:
+            # cache not found
+            return None
         else:
             return get_names(records=records, identifier=identifier)
 
 
 def get_names(records: BytesPairing, identifier: ID) -> Set[str]:
-    strings = set()
-    for key, value in records.items():
-        text = utf8_decode(data=value)
-        did = ID.parse(identifier=text)
-        if did is None:
-            assert False, f'ANS ID error: {text}'
-        elif did.is_same_as(other=identifier):
-            name = utf8_decode(data=key)
-            strings.add(name)
-    return strings
+    # compare with the naked ID in bytes, no need to parse each record
+    naked = utf8_encode(string=str(identifier.without_terminal()))
+    prefix = naked + b'/'
+    return {
+        utf8_decode(data=key) for key, value in records.items()
+        if value == naked or value.startswith(prefix)
+    }
@@ -23,7 +23,13 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple, List
+
+try:
+    import orjson  # optional, faster JSON for the commands in redis
+except ImportError:
+    orjson = None
 
 from dimples import utf8_encode, utf8_decode, json_encode, json_decode
 from dimples import ID, Content, Command
@@ -36,6 +42,40 @@ from ...utils import StrMap
 
 class UserCache(SuperCache):
 
+    """
+        Preload
+        ~~~~~~~
+
+        get contacts & commands of the user with one MGET
+    """
+    def __contacts_cache_name(self, user: ID) -> str:
+        return user_cache_name(db_name=self.db_name, tbl_name=self.tbl_name, user=user, kind='contacts')
+
+    async def load_user(self, user: ID) -> Tuple[Optional[List[ID]], Optional[Command],
+                                                 Optional[BlockCommand], Optional[MuteCommand]]:
+        """ get contacts, contacts command, block command & mute command in one round trip """
+        redis = self.redis
+        if redis is None:
+            return None, None, None, None
+        keys = [
+            self.__contacts_cache_name(user=user),
+            self.__contacts_command_cache_name(user=user),
+            self.__block_command_cache_name(user=user),
+            self.__mute_command_cache_name(user=user),
+        ]
+        values = redis.mget(keys)
+        contacts = None if values[0] is None else ID.convert(array=utf8_decode(data=values[0]).splitlines())
+        con_cmd = decode_command(value=values[1])
+        if con_cmd is not None:
+            con_cmd = Content.parse(content=con_cmd)  # -> StorageCommand
+        blo_cmd = decode_command(value=values[2])
+        if blo_cmd is not None:
+            blo_cmd = BlockCommand(content=blo_cmd)
+        mut_cmd = decode_command(value=values[3])
+        if mut_cmd is not None:
+            mut_cmd = MuteCommand(content=mut_cmd)
+        return contacts, con_cmd, blo_cmd, mut_cmd
+
     """
         Contacts Command
         ~~~~~~~~~~~~~~~~
@@ -43,8 +83,7 @@ class UserCache(SuperCache):
         redis key: 'mkm.user.{ADDRESS}.cmd.contacts'
     """
     def __contacts_command_cache_name(self, user: ID) -> str:
-        address = str(user.address)
-        return '%s.%s.%s.cmd.contacts' % (self.db_name, self.tbl_name, address)
+        return user_cache_name(db_name=self.db_name, tbl_name=self.tbl_name, user=user, kind='cmd.contacts')
 
     async def save_contacts_command(self, content: Command, user: ID) -> bool:
         key = self.__contacts_command_cache_name(user=user)
@@ -57,19 +96,12 @@ class UserCache(SuperCache):
             return Content.parse(content=dictionary)  # -> StorageCommand
 
     async def __save_command(self, key: str, content: Command) -> bool:
-        dictionary = content.to_map()
-        js = json_encode(container=dictionary)
-        value = utf8_encode(string=js)
+        value = encode_command(dictionary=content.to_map())
         return await self.set(name=key, value=value, expires=self.EXPIRES)
 
     async def __load_command(self, key: str) -> Optional[StrMap]:
         value = await self.get(name=key)
-        if value is None:
-            return None
-        js = utf8_decode(data=value)
-        dictionary = json_decode(string=js)
-        assert dictionary is not None, f'cmd error: {value}'
-        return dictionary
+        return decode_command(value=value)
 
     """
         Block Command
@@ -78,8 +110,7 @@ class UserCache(SuperCache):
         redis key: 'mkm.user.{ADDRESS}.cmd.block'
     """
     def __block_command_cache_name(self, user: ID) -> str:
-        address = str(user.address)
-        return '%s.%s.%s.cmd.block' % (self.db_name, self.tbl_name, address)
+        return user_cache_name(db_name=self.db_name, tbl_name=self.tbl_name, user=user, kind='cmd.block')
 
     async def save_block_command(self, content: BlockCommand, user: ID) -> bool:
         key = self.__block_command_cache_name(user=user)
@@ -98,8 +129,7 @@ class UserCache(SuperCache):
         redis key: 'mkm.user.{ADDRESS}.cmd.mute'
     """
     def __mute_command_cache_name(self, user: ID) -> str:
-        address = str(user.address)
-        return '%s.%s.%s.cmd.mute' % (self.db_name, self.tbl_name, address)
+        return user_cache_name(db_name=self.db_name, tbl_name=self.tbl_name, user=user, kind='cmd.mute')
 
     async def save_mute_command(self, content: MuteCommand, user: ID) -> bool:
         key = self.__mute_command_cache_name(user=user)
@@ -110,3 +140,28 @@ class UserCache(SuperCache):
         dictionary = await self.__load_command(key=key)
         if dictionary is not None:
             return MuteCommand(content=dictionary)
+
+
+@lru_cache(maxsize=65536)
+def user_cache_name(db_name: str, tbl_name: str, user: ID, kind: str) -> str:
+    """ redis key: 'mkm.user.{ADDRESS}.{kind}' """
+    return '%s.%s.%s.%s' % (db_name, tbl_name, user.address, kind)
+
+
+def encode_command(dictionary: StrMap) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(dictionary)
+    js = json_encode(container=dictionary)
+    return utf8_encode(string=js)
+
+
+def decode_command(value: Optional[bytes]) -> Optional[StrMap]:
+    if value is None:
+        return None
+    elif orjson is not None:
+        dictionary = orjson.loads(value)
+    else:
+        js = utf8_decode(data=value)
+        dictionary = json_decode(string=js)
+    assert dictionary is not None, f'cmd error: {value}'
+    return dictionary
@@ -24,16 +24,19 @@
 # ==============================================================================
 
 import threading
-from typing import Optional, Set, Tuple
+from collections import defaultdict
+from typing import Optional, Set, FrozenSet, Tuple
 from typing import MutableMapping
 
 from aiou.mem import CachePool
 
+from dimples import DateTime
 from dimples import ID
 from dimples.utils import Config
-from dimples.database import DbTask, DataCache
+from dimples.database import DbTask
 
 from .redis import ActiveCache
+from .t_base import DataCache
 
 
 class ActTask(DbTask[str, Set[ID]]):
@@ -68,54 +71,78 @@ class ActTask(DbTask[str, Set[ID]]):
 
 class ActiveTable(DataCache):
 
+    CACHE_EXPIRES = ActTask.MEM_CACHE_REFRESH  # seconds, lifetime of the active users snapshot
+
     def __init__(self, config: Config):
         super().__init__(pool_name='session')  # 'active_users' => Set(ID)
-        self._socket_address: MutableMapping[ID, Set[Tuple[str, int]]] = {}  # ID => set(socket_address)
+        self._socket_address: MutableMapping[ID, Set[Tuple[str, int]]] = defaultdict(set)  # ID => set(socket_address)
         self._redis = ActiveCache(config=config)
+        # the task has no key, so just create it once
+        self._task = ActTask(redis=self._redis,
+                             mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        # immutable snapshot of active users, replaced as a whole when expired
+        self.__snapshot: FrozenSet[ID] = frozenset()
+        self.__snapshot_expired = 0
 
     # noinspection PyMethodMayBeStatic
     def show_info(self):
         print('!!!      active users in memory only !!!')
 
-    def _new_task(self) -> ActTask:
-        return ActTask(redis=self._redis,
-                       mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
-
     async def clear_socket_addresses(self):
         """ clear before station start """
         with self.lock:
             self.cache.erase(key='active_users')
+            self.__snapshot = frozenset()
+            self.__snapshot_expired = 0
             await self._redis.clear_socket_addresses()
 
-    async def get_active_users(self) -> Set[ID]:
+    async def get_active_users(self) -> FrozenSet[ID]:
         """ read by archivist bot """
-        task = self._new_task()
-        users = await task.load()
-        return set() if users is None else users
-
-    async def add_socket_address(self, user: ID, address: Tuple[str, int]) -> Set[Tuple[str, int]]:
-        """ wrote by station only """
-        with self.lock:
+        now = DateTime.current_timestamp()
+        if now < self.__snapshot_expired:
+            # snapshot not expired, return it without locking
+            return self.__snapshot
+        # reload and replace the snapshot
+        users = await self._task.load()
+        snapshot = frozenset() if users is None else frozenset(users)
+        self.__snapshot = snapshot
+        self.__snapshot_expired = now + self.CACHE_EXPIRES
+        return snapshot
+
+    async def add_socket_address(self, user: ID, address: Tuple[str, int]) -> FrozenSet[Tuple[str, int]]:
+        """
+        Add socket address for the user (wrote by station only)
+
+        :return: snapshot of the user's socket addresses, owned by the caller
+        """
+        # lock for this user only, so the set cannot be removed by a concurrent
+        # 'remove_socket_address()', and the last write carries the latest addresses
+        with self.key_lock(key=user):
             # 1. add into local cache
-            sockets = self._socket_address.get(user)
-            if sockets is None:
-                sockets = set()
-                self._socket_address[user] = sockets
+            sockets = self._socket_address[user]
             sockets.add(address)
+            snapshot = frozenset(sockets)
             # 2. store into Redis Server
-            await self._redis.save_socket_addresses(user=user, addresses=sockets)
-            return sockets
+            await self._redis.save_socket_addresses(user=user, addresses=snapshot)
+        return snapshot
 
-    async def remove_socket_address(self, user: ID, address: Tuple[str, int]) -> Set[Tuple[str, int]]:
-        """ wrote by station only """
-        with self.lock:
+    async def remove_socket_address(self, user: ID, address: Tuple[str, int]) -> FrozenSet[Tuple[str, int]]:
+        """
+        Remove socket address for the user (wrote by station only)
+
+        :return: snapshot of the user's remaining socket addresses, owned by the caller
+        """
+        # lock for this user only, see 'add_socket_address()'
+        with self.key_lock(key=user):
             # 1. remove from local cache
+            #    (use 'get()' here, don't create empty set for the user)
             sockets = self._socket_address.get(user)
             if sockets is not None:
                 sockets.discard(address)
                 if len(sockets) == 0:
                     self._socket_address.pop(user, None)
-                    sockets = None
+            snapshot = frozenset() if sockets is None else frozenset(sockets)
             # 2. store into Redis Server
-            await self._redis.save_socket_addresses(user=user, addresses=sockets)
-            return sockets
+            #    (empty addresses will remove the user from the redis server)
+            await self._redis.save_socket_addresses(user=user, addresses=snapshot)
+        return snapshot
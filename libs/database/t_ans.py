@@ -24,18 +24,23 @@
 # ==============================================================================
 
 import threading
-from typing import Optional, Union, Set
+from typing import Optional, Union, Set, Dict
 
 from aiou.mem import CachePool
 
 from dimples import DateTime
 from dimples import ID
 from dimples.utils import Config
-from dimples.database import DbTask, DataCache
+from dimples.utils import SharedCacheManager
+from dimples.database import DbTask
 
 from .redis import AddressNameCache
 from .dos import AddressNameStorage
 from .dos.ans import AnsMap
+from .t_base import DataCache, TaskPool
+
+
+AnsIndex = Dict[ID, Set[str]]  # ID => Set[name]
 
 
 # noinspection PyAbstractClass
@@ -52,6 +57,7 @@ class AnsTask(DbTask):
 class AllTask(AnsTask):
 
     ALL_KEY = 'all_records'
+    INDEX_KEY = 'by_id'
 
     @property  # Override
     def cache_key(self) -> str:
@@ -59,7 +65,12 @@ class AllTask(AnsTask):
 
     # Override
     async def _read_data(self) -> Optional[AnsMap]:
-        return await self._dos.load_records()
+        records = await self._dos.load_records()
+        if records is not None:
+            # warm up the redis server, so the later missing names
+            # will not be written back one by one
+            await self._redis.save_records(records=records)
+        return records
 
     # Override
     async def _write_data(self, value: AnsMap) -> bool:
@@ -79,6 +90,14 @@ class IdTask(AnsTask):
     def cache_key(self) -> str:
         return self._name
 
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, value: str):
+        self._name = value
+
     # Override
     async def _read_data(self) -> Optional[ID]:
         return await self._redis.get_record(name=self._name)
@@ -101,8 +120,17 @@ class NameTask(AnsTask):
     def cache_key(self) -> ID:
         return self._identifier
 
+    @property
+    def identifier(self) -> ID:
+        return self._identifier
+
+    @identifier.setter
+    def identifier(self, value: ID):
+        self._identifier = value
+
     # Override
     async def _read_data(self) -> Optional[Set[str]]:
+        # the redis server will return None when cache not found
         return await self._redis.get_names(identifier=self._identifier)
 
     # Override
@@ -116,42 +144,74 @@ class AddressNameTable(DataCache):
         super().__init__(pool_name='ans')  # str => ID
         self._redis = AddressNameCache(config=config)
         self._dos = AddressNameStorage(config=config)
+        # all records & the reverse index are kept in their own pool,
+        # so no name in the 'ans' pool can collide with their keys
+        self._all_cache = SharedCacheManager().get_pool(name='ans.all')
+        # the task for all records has no key, so just create it once
+        self._all_task = AllTask(redis=self._redis, storage=self._dos,
+                                 mutex_lock=self._mutex_lock, cache_pool=self._all_cache)
+        self._id_tasks = TaskPool()
+        self._name_tasks = TaskPool()
 
     def show_info(self):
         self._dos.show_info()
 
-    def _new_all_task(self) -> AllTask:
-        return AllTask(redis=self._redis, storage=self._dos,
-                       mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
-
-    def _new_id_task(self, name: str) -> IdTask:
-        return IdTask(name=name,
-                      redis=self._redis, storage=self._dos,
-                      mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+    def _acquire_id_task(self, name: str) -> IdTask:
+        task = self._id_tasks.acquire()
+        if task is None:
+            return IdTask(name=name,
+                          redis=self._redis, storage=self._dos,
+                          mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        task.name = name
+        return task
 
-    def _new_name_task(self, identifier: ID) -> NameTask:
+    def _acquire_name_task(self, identifier: ID) -> NameTask:
         assert identifier.terminal is None, f'not a naked id: {identifier}'
-        return NameTask(identifier=identifier,
-                        redis=self._redis, storage=self._dos,
-                        mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        task = self._name_tasks.acquire()
+        if task is None:
+            return NameTask(identifier=identifier,
+                            redis=self._redis, storage=self._dos,
+                            mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        task.identifier = identifier
+        return task
 
     async def _load_records(self) -> AnsMap:
-        task = self._new_all_task()
-        records = await task.load()
+        records = await self._all_task.load()
         return {} if records is None else records
 
+    async def _load_index(self) -> AnsIndex:
+        """ reverse index of all records, rebuilt whenever the records reloaded """
+        now = DateTime.current_timestamp()
+        all_records = await self._load_records()
+        pair, _ = self._all_cache.fetch(key=AllTask.INDEX_KEY, now=now)
+        if pair is not None and pair[0] is all_records:
+            return pair[1]
+        index = build_index(records=all_records)
+        pair = (all_records, index)
+        self._all_cache.update(key=AllTask.INDEX_KEY, value=pair, life_span=AnsTask.MEM_CACHE_EXPIRES, now=now)
+        return index
+
     async def save_record(self, name: str, identifier: ID) -> bool:
+        # load all records (and the reverse index) before locking,
+        # the task loading them takes the same non-reentrant lock
+        index = await self._load_index()
+        all_records = await self._load_records()
         now = DateTime.current_timestamp()
         with self.lock:
             #
             #  1. update memory cache
             #
+            old = all_records.get(name)
+            if old is not None:
+                # remove: old ID => Set[str]
+                self.cache.erase(key=old)
+                remove_index(index=index, name=name, identifier=old)
             if identifier is not None:
                 # remove: ID => Set[str]
                 self.cache.erase(key=identifier)
-            all_records = await self._load_records()
+                append_index(index=index, name=name, identifier=identifier)
             all_records[name] = identifier
-            self.cache.update(key=AllTask.ALL_KEY, value=all_records, life_span=AnsTask.MEM_CACHE_EXPIRES, now=now)
+            self._all_cache.update(key=AllTask.ALL_KEY, value=all_records, life_span=AnsTask.MEM_CACHE_EXPIRES, now=now)
             #
             #  2. update redis server
             #
@@ -159,60 +219,82 @@ class AddressNameTable(DataCache):
             #
             #  3. update local storage
             #
-            return await self._dos.save_records(records=all_records)
+            if not await self._dos.append_record(name=name, identifier=identifier):
+                # journal failed, save all records instead
+                return await self._dos.save_records(records=all_records)
+            elif self._dos.journal_size > len(all_records) * 2:
+                # compact the journal
+                return await self._dos.save_records(records=all_records)
+            return True
 
     async def get_record(self, name: str) -> Optional[ID]:
         #
         #  1. get record with name
         #
-        task = self._new_id_task(name=name)
-        did = await task.load()
-        if isinstance(did, ID):
+        task = self._acquire_id_task(name=name)
+        try:
+            did = await task.load()
+        finally:
+            self._id_tasks.release(task=task)
+        if did is not None:
             return did
         #
         #  2. load all records
         #
-        task = self._new_all_task()
-        all_records = await task.load()
-        if isinstance(all_records, dict):
-            did = all_records.get(name)
+        all_records = await self._load_records()
+        did = all_records.get(name)
         #
         #   3. update memory cache
         #
-        with self.lock:
-            if did is not None:
-                await self._redis.save_record(name=name, identifier=did)
-            self.cache.update(key=name, value=did, life_span=AnsTask.MEM_CACHE_EXPIRES)
+        self.cache.update(key=name, value=did, life_span=AnsTask.MEM_CACHE_EXPIRES)
         return did
 
     async def get_names(self, identifier: ID) -> Set[str]:
         #
         #  1. get names for id
         #
-        task = self._new_name_task(identifier=identifier)
-        names = await task.load()
-        if isinstance(names, set):
+        task = self._acquire_name_task(identifier=identifier)
+        try:
+            names = await task.load()
+        finally:
+            self._name_tasks.release(task=task)
+        if names is not None:
             return names
         #
-        #  2. load all records
+        #  2. get names from the reverse index
         #
-        task = self._new_all_task()
-        all_records = await task.load()
-        if isinstance(all_records, dict):
-            names = get_names(records=all_records, identifier=identifier)
-        else:
-            names = set()
+        index = await self._load_index()
+        names = index.get(identifier)
+        names = set() if names is None else set(names)
         #
         #   3. update memory cache
         #
-        with self.lock:
+        with self.key_lock(key=identifier):
             self.cache.update(key=identifier, value=names, life_span=AnsTask.MEM_CACHE_EXPIRES)
         return names
 
 
-def get_names(records: AnsMap, identifier: ID) -> Set[str]:
-    strings = set()
+def build_index(records: AnsMap) -> AnsIndex:
+    index = {}
     for name, did in records.items():
-        if identifier.is_same_as(other=did):
-            strings.add(name)
-    return strings
+        if did is not None:
+            append_index(index=index, name=name, identifier=did)
+    return index
+
+
+def append_index(index: AnsIndex, name: str, identifier: ID):
+    identifier = identifier.without_terminal()
+    names = index.get(identifier)
+    if names is None:
+        index[identifier] = {name}
+    else:
+        names.add(name)
+
+
+def remove_index(index: AnsIndex, name: str, identifier: ID):
+    identifier = identifier.without_terminal()
+    names = index.get(identifier)
+    if names is not None:
+        names.discard(name)
+        if len(names) == 0:
+            index.pop(identifier, None)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2019 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+import threading
+from collections import deque
+from typing import Generic, TypeVar, Optional, Any
+
+from dimples.database import DbTask
+from dimples.database import DataCache as SuperCache
+
+
+T = TypeVar('T', bound=DbTask)
+
+
+# noinspection PyAbstractClass
+class DataCache(SuperCache):
+    """ Data cache with striped mutex locks """
+
+    # tables are shared by all sessions, and each session runs its own event loop
+    # in a separate thread, so the locks must be thread locks (not asyncio.Lock);
+    # striping them by key lets different users proceed in parallel.
+    LOCK_STRIPES = 256
+
+    def __init__(self, pool_name: str):
+        super().__init__(pool_name=pool_name)
+        self.__stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    # protected
+    def key_lock(self, key: Any) -> threading.Lock:
+        """ get mutex lock for the key """
+        return self.__stripes[hash(key) % self.LOCK_STRIPES]
+
+
+class TaskPool(Generic[T]):
+    """ Free list of idle tasks """
+
+    def __init__(self, capacity: int = 64):
+        super().__init__()
+        self.__capacity = capacity
+        self.__tasks = deque()  # deque.pop() & deque.append() are thread safe
+
+    def acquire(self) -> Optional[T]:
+        """ get an idle task, or None if the pool is empty """
+        try:
+            return self.__tasks.pop()
+        except IndexError:
+            return None
+
+    def release(self, task: T):
+        """ put the task back after using """
+        if len(self.__tasks) < self.__capacity:
+            self.__tasks.append(task)
@@ -32,6 +32,8 @@ from dimples import ID
 from dimples.utils import Config
 from dimples.database import DbTask, DataCache
 
+from .t_base import TaskPool
+from .writer import DelayedWriter
 from .redis import DeviceCache
 from .dos import DeviceStorage, DeviceInfo
 from .dos.device import insert_device
@@ -51,6 +53,14 @@ class DevTask(DbTask[ID, List[DeviceInfo]]):
     def cache_key(self) -> ID:
         return self._identifier
 
+    @property
+    def user(self) -> ID:
+        return self._identifier
+
+    @user.setter
+    def user(self, identifier: ID):
+        self._identifier = identifier
+
     # Override
     async def _read_data(self) -> Optional[List[DeviceInfo]]:
         user = self._identifier
@@ -73,8 +83,14 @@ class DevTask(DbTask[ID, List[DeviceInfo]]):
         user = self._identifier
         # 1. store into redis server
         ok1 = await self._redis.save_devices(devices=value, user=user)
-        # 2. save into local storage
-        ok2 = await self._dos.save_devices(devices=value, user=user)
+        # 2. save into local storage in background,
+        #    the later saving for the same user will replace this one
+        storage = self._dos
+        writer = DelayedWriter()
+        if writer.put(key=('devices', user), job=lambda: storage.save_devices(devices=value, user=user)):
+            return True
+        # writer closed, save into local storage directly
+        ok2 = await storage.save_devices(devices=value, user=user)
         return ok1 or ok2
 
 
@@ -84,24 +100,38 @@ class DeviceTable(DataCache):
         super().__init__(pool_name='devices')  # ID => DeviceInfo
         self._redis = DeviceCache(config=config)
         self._dos = DeviceStorage(config=config)
+        self._tasks = TaskPool()
 
     def show_info(self):
         self._dos.show_info()
 
-    def _new_task(self, user: ID) -> DevTask:
+    def _acquire_task(self, user: ID) -> DevTask:
         assert user.terminal is None, f'not a naked id: {user}'
-        return DevTask(user=user,
-                       redis=self._redis, storage=self._dos,
-                       mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        task = self._tasks.acquire()
+        if task is None:
+            return DevTask(user=user,
+                           redis=self._redis, storage=self._dos,
+                           mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
+        task.user = user
+        return task
+
+    def _release_task(self, task: DevTask):
+        self._tasks.release(task=task)
 
     async def get_devices(self, user: ID) -> List[DeviceInfo]:
-        task = self._new_task(user=user)
-        devices = await task.load()
+        task = self._acquire_task(user=user)
+        try:
+            devices = await task.load()
+        finally:
+            self._release_task(task=task)
         return [] if devices is None else devices
 
     async def save_devices(self, devices: List[DeviceInfo], user: ID) -> bool:
-        task = self._new_task(user=user)
-        return await task.save(value=devices)
+        task = self._acquire_task(user=user)
+        try:
+            return await task.save(value=devices)
+        finally:
+            self._release_task(task=task)
 
     async def add_device(self, device: DeviceInfo, user: ID) -> bool:
         # get all devices info with ID
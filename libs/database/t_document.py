@@ -74,6 +74,9 @@ class DocumentTable(DataCache, DocumentDBI):
         super().__init__(pool_name='documents')  # ID => List[Document]
         self._redis = DocumentCache(config=config)
         self._dos = DocumentStorage(config=config)
+        # the scan task has no key, so just create it once
+        self._scan_task = ScanTask(storage=self._dos,
+                                   mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
 
     def show_info(self):
         self._dos.show_info()
@@ -85,10 +88,6 @@ class DocumentTable(DataCache, DocumentDBI):
                        redis=self._redis, storage=self._dos,
                        mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
 
-    def _new_scan_task(self) -> ScanTask:
-        return ScanTask(storage=self._dos,
-                        mutex_lock=self._mutex_lock, cache_pool=self._cache_pool)
-
     #
     #   Document DBI
     #
@@ -129,6 +128,5 @@ class DocumentTable(DataCache, DocumentDBI):
 
     async def scan_documents(self) -> List[Document]:
         """ Scan all documents from data directory """
-        task = self._new_scan_task()
-        docs = await task.load()
+        docs = await self._scan_task.load()
         return [] if docs is None else docs
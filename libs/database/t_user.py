@@ -24,10 +24,12 @@
 # ==============================================================================
 
 import threading
-from typing import Optional, List
+from collections import OrderedDict
+from typing import Optional, Any, List, Type
 
 from aiou.mem import CachePool
 
+from dimples import DateTime
 from dimples import ID, Command
 from dimples import BlockCommand, MuteCommand
 from dimples.utils import is_before
@@ -38,10 +40,18 @@ from dimples.database import DbTask
 
 from .redis import UserCache
 from .dos import UserStorage
+from .t_base import TaskPool
+from .writer import DelayedWriter
 
 
-# noinspection PyAbstractClass
 class BaseTask(DbTask):
+    """ Task for one kind of user data, the kinds differ only in method names """
+
+    KIND: str = None      # key prefix for the delayed writer
+    GETTER: str = None    # method name for loading from redis server
+    LOADER: str = None    # method name for loading from local storage
+    SAVER: str = None     # method name for saving into redis server & local storage
+    EMPTY = None          # factory of the placeholder when data not found
 
     def __init__(self, user: ID,
                  redis: UserCache, storage: UserStorage,
@@ -55,120 +65,76 @@ class BaseTask(DbTask):
     def cache_key(self) -> ID:
         return self._user
 
-
-class UsrTask(BaseTask):
+    def bind(self, user: ID, mutex_lock: threading.Lock):
+        """ re-bind an idle task to another user """
+        self._user = user
+        self._lock = mutex_lock
 
     # Override
-    async def _read_data(self) -> Optional[List[ID]]:
+    async def _read_data(self) -> Optional[Any]:
         user = self._user
         # 1. the redis server will return None when cache not found
-        # 2. when redis server return an empty array, no need to check local storage again
-        contacts = await self._redis.get_contacts(user=user)
-        if contacts is not None:
-            return contacts
+        # 2. when redis server return an empty value, no need to check local storage again
+        value = await getattr(self._redis, self.GETTER)(user=user)
+        if value is not None:
+            return value
         # 3. try to load from local storage
-        contacts = await self._dos.load_contacts(user=user)
-        if contacts is None:
-            # 4. create an empty array as a placeholder for the memory cache
-            contacts = []
+        value = await getattr(self._dos, self.LOADER)(user=user)
+        if value is None:
+            if self.EMPTY is None:
+                return None
+            # 4. create an empty value as a placeholder for the memory cache
+            value = self.EMPTY()
         # 5. update redis server
-        await self._redis.save_contacts(contacts=contacts, user=user)
-        return contacts
+        await getattr(self._redis, self.SAVER)(value, user=user)
+        return value
 
     # Override
-    async def _write_data(self, value: List[ID]) -> bool:
+    async def _write_data(self, value: Any) -> bool:
         user = self._user
         # 1. store into redis server
-        ok1 = await self._redis.save_contacts(contacts=value, user=user)
-        # 2. save into local storage
-        ok2 = await self._dos.save_contacts(contacts=value, user=user)
+        ok1 = await getattr(self._redis, self.SAVER)(value, user=user)
+        # 2. save into local storage in background
+        saver = getattr(self._dos, self.SAVER)
+        if DelayedWriter().put(key=(self.KIND, user), job=lambda: saver(value, user=user)):
+            return True
+        # writer closed, save into local storage directly
+        ok2 = await saver(value, user=user)
         return ok1 or ok2
 
 
-class ConTask(BaseTask):
+class UsrTask(BaseTask):
+    """ List[ID] """
+    KIND = 'contacts'
+    GETTER, LOADER, SAVER = 'get_contacts', 'load_contacts', 'save_contacts'
+    EMPTY = list
 
-    # Override
-    async def _read_data(self) -> Optional[Command]:
-        user = self._user
-        # 1. get from redis server
-        cmd = await self._redis.get_contacts_command(user=user)
-        if cmd is not None:
-            return cmd
-        # 2. get from local storage
-        cmd = await self._dos.get_contacts_command(user=user)
-        if cmd is None:
-            return None
-        # 3. update redis server
-        await self._redis.save_contacts_command(content=cmd, user=user)
-        return cmd
 
-    # Override
-    async def _write_data(self, value: Command) -> bool:
-        user = self._user
-        # 1. store into redis server
-        ok1 = await self._redis.save_contacts_command(content=value, user=user)
-        # 2. save into local storage
-        ok2 = await self._dos.save_contacts_command(content=value, user=user)
-        return ok1 or ok2
+class ConTask(BaseTask):
+    """ StorageCommand """
+    KIND = 'cmd.contacts'
+    GETTER, LOADER, SAVER = 'get_contacts_command', 'get_contacts_command', 'save_contacts_command'
 
 
 class BloTask(BaseTask):
-
-    # Override
-    async def _read_data(self) -> Optional[BlockCommand]:
-        user = self._user
-        # 1. get from redis server
-        cmd = await self._redis.get_block_command(user=user)
-        if cmd is not None:
-            return cmd
-        # 2. get from local storage
-        cmd = await self._dos.get_block_command(user=user)
-        if cmd is None:
-            return None
-        # 3. update redis server
-        await self._redis.save_block_command(content=cmd, user=user)
-        return cmd
-
-    # Override
-    async def _write_data(self, value: BlockCommand) -> bool:
-        user = self._user
-        # 1. store into redis server
-        ok1 = await self._redis.save_block_command(content=value, user=user)
-        # 2. save into local storage
-        ok2 = await self._dos.save_block_command(content=value, user=user)
-        return ok1 or ok2
+    """ BlockCommand """
+    KIND = 'cmd.block'
+    GETTER, LOADER, SAVER = 'get_block_command', 'get_block_command', 'save_block_command'
 
 
 class MutTask(BaseTask):
-
-    # Override
-    async def _read_data(self) -> Optional[MuteCommand]:
-        user = self._user
-        # 1. get from redis server
-        cmd = await self._redis.get_mute_command(user=user)
-        if cmd is not None:
-            return cmd
-        # 2. get from local storage
-        cmd = await self._dos.get_mute_command(user=user)
-        if cmd is None:
-            return None
-        # 3. update redis server
-        await self._redis.save_mute_command(content=cmd, user=self._user)
-        return cmd
-
-    # Override
-    async def _write_data(self, value: MuteCommand) -> bool:
-        user = self._user
-        # 1. store into redis server
-        ok1 = await self._redis.save_mute_command(content=value, user=user)
-        # 2. save into local storage
-        ok2 = await self._dos.save_mute_command(content=value, user=user)
-        return ok1 or ok2
+    """ MuteCommand """
+    KIND = 'cmd.mute'
+    GETTER, LOADER, SAVER = 'get_mute_command', 'get_mute_command', 'save_mute_command'
 
 
 class UserTable(UserDBI, ContactDBI):
     """ Implementations of UserDBI """
 
+    LOCK_STRIPES = 256  # same striping as DataCache.key_lock()
+
+    LAST_TIMES_CAPACITY = 10000  # max (kind, user) pairs to remember the last command time
+
     def __init__(self, config: Config):
         super().__init__()
         man = SharedCacheManager()
@@ -178,34 +144,109 @@ class UserTable(UserDBI, ContactDBI):
         self._cache = man.get_pool(name='contacts')             # ID => List[ID]
         self._redis = UserCache(config=config)
         self._dos = UserStorage(config=config)
-        self._lock = threading.Lock()
+        self.__locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        # task class => cache pool
+        self.__pools = {
+            UsrTask: self._cache,
+            ConTask: self._cmd_contacts,
+            BloTask: self._cmd_block,
+            MutTask: self._cmd_mute,
+        }
+        # task class => idle tasks
+        self.__tasks = {cls: TaskPool() for cls in self.__pools}
+        # (kind, user) => time of the last saved command
+        self.__last_times: OrderedDict = OrderedDict()
+        self.__last_times_lock = threading.Lock()
 
     def show_info(self):
         self._dos.show_info()
 
-    def _new_task(self, user: ID) -> UsrTask:
-        assert user.terminal is None, f'not a naked id: {user}'
-        # create task with naked id
-        return UsrTask(user=user, cache_pool=self._cache,
-                       redis=self._redis, storage=self._dos, mutex_lock=self._lock)
-
-    def _new_con_task(self, user: ID) -> ConTask:
-        assert user.terminal is None, f'not a naked id: {user}'
-        # create task with naked id
-        return ConTask(user=user, cache_pool=self._cmd_contacts,
-                       redis=self._redis, storage=self._dos, mutex_lock=self._lock)
+    def _user_lock(self, user: ID) -> threading.Lock:
+        """ get mutex lock for the user """
+        return self.__locks[hash(user) % self.LOCK_STRIPES]
 
-    def _new_blo_task(self, user: ID) -> BloTask:
+    async def prepare_user(self, user: ID):
+        """ load contacts & commands of the user from redis server in one round trip """
         assert user.terminal is None, f'not a naked id: {user}'
-        # create task with naked id
-        return BloTask(user=user, cache_pool=self._cmd_block,
-                       redis=self._redis, storage=self._dos, mutex_lock=self._lock)
-
-    def _new_mut_task(self, user: ID) -> MutTask:
+        # same lock as the tasks, so a command saved by another session
+        # will not be replaced by the older value from this round trip
+        with self._user_lock(user=user):
+            values = await self._redis.load_user(user=user)
+            now = DateTime.current_timestamp()
+            life_span = BaseTask.MEM_CACHE_EXPIRES
+            pools = [self._cache, self._cmd_contacts, self._cmd_block, self._cmd_mute]
+            for pool, value in zip(pools, values):
+                if value is None:
+                    # missed in redis server, will be loaded by task later
+                    continue
+                _, holder = pool.fetch(key=user, now=now)
+                if holder is None:
+                    # only fill the empty pool
+                    pool.update(key=user, value=value, life_span=life_span, now=now)
+
+    def _acquire_task(self, task_class: Type[BaseTask], user: ID) -> BaseTask:
         assert user.terminal is None, f'not a naked id: {user}'
-        # create task with naked id
-        return MutTask(user=user, cache_pool=self._cmd_mute,
-                       redis=self._redis, storage=self._dos, mutex_lock=self._lock)
+        lock = self._user_lock(user=user)
+        task = self.__tasks[task_class].acquire()
+        if task is None:
+            # create task with naked id
+            return task_class(user=user, cache_pool=self.__pools[task_class],
+                              redis=self._redis, storage=self._dos, mutex_lock=lock)
+        task.bind(user=user, mutex_lock=lock)
+        return task
+
+    def _release_task(self, task: BaseTask):
+        self.__tasks[type(task)].release(task=task)
+
+    async def _load(self, task_class: Type[BaseTask], user: ID):
+        task = self._acquire_task(task_class=task_class, user=user)
+        try:
+            return await task.load()
+        finally:
+            self._release_task(task=task)
+
+    async def _save(self, task_class: Type[BaseTask], user: ID, value) -> bool:
+        task = self._acquire_task(task_class=task_class, user=user)
+        try:
+            return await task.save(value=value)
+        finally:
+            self._release_task(task=task)
+
+    def _get_last_time(self, kind: str, user: ID) -> Optional[DateTime]:
+        with self.__last_times_lock:
+            return self.__last_times.get((kind, user))
+
+    def _set_last_time(self, kind: str, user: ID, when: DateTime):
+        with self.__last_times_lock:
+            times = self.__last_times
+            times[(kind, user)] = when
+            times.move_to_end((kind, user))
+            if len(times) > self.LAST_TIMES_CAPACITY:
+                times.popitem(last=False)
+
+    async def _save_command(self, task_class: Type[BaseTask], content: Command, user: ID) -> bool:
+        kind = task_class.KIND
+        # check old record with time
+        new_time = content.time
+        if new_time is not None and new_time > 0:
+            old_time = self._get_last_time(kind=kind, user=user)
+            if old_time is None:
+                # last time not remembered, check the stored command
+                old = await self._load(task_class, user=user)
+                old_time = None if old is None else old.time
+            if old_time is None:
+                # no old record
+                pass
+            elif is_before(old_time=old_time, new_time=new_time):
+                # command expired, drop it
+                return False
+            elif new_time == old_time:
+                # same command sent again, no need to save it
+                return False
+        ok = await self._save(task_class, user=user, value=content)
+        if ok and new_time is not None:
+            self._set_last_time(kind=kind, user=user, when=new_time)
+        return ok
 
     #
     #   User DBI
@@ -225,92 +266,39 @@ class UserTable(UserDBI, ContactDBI):
 
     # Override
     async def get_contacts(self, user: ID) -> List[ID]:
-        task = self._new_task(user=user)
-        contacts = await task.load()
+        contacts = await self._load(UsrTask, user=user)
         return [] if contacts is None else contacts
 
     # Override
     async def save_contacts(self, contacts: List[ID], user: ID) -> bool:
-        task = self._new_task(user=user)
-        return await task.save(value=contacts)
+        return await self._save(UsrTask, user=user, value=contacts)
 
     #
     #   Contacts
     #
 
-    async def _is_contacts_expired(self, user: ID, content: Command) -> bool:
-        """ check old record with command time """
-        new_time = content.time
-        if new_time is None or new_time <= 0:
-            return False
-        # check old record
-        old, _ = await self.get_contacts_command(user=user)
-        if old is not None and is_before(old_time=old.time, new_time=new_time):
-            # command expired
-            return False
-
     async def save_contacts_command(self, content: Command, user: ID) -> bool:
-        # check old record with time
-        if await self._is_contacts_expired(user=user, content=content):
-            # command expired, drop it
-            return False
-        task = self._new_con_task(user=user)
-        return await task.save(value=content)
+        return await self._save_command(ConTask, content=content, user=user)
 
     async def get_contacts_command(self, user: ID) -> Optional[Command]:
-        task = self._new_con_task(user=user)
-        return await task.load()
+        return await self._load(ConTask, user=user)
 
     #
     #   Block List
     #
 
-    async def _is_blocked_expired(self, user: ID, content: BlockCommand) -> bool:
-        """ check old record with command time """
-        new_time = content.time
-        if new_time is None or new_time <= 0:
-            return False
-        # check old record
-        old = await self.get_block_command(user=user)
-        if old is not None and is_before(old_time=old.time, new_time=new_time):
-            # command expired
-            return False
-
     async def save_block_command(self, content: BlockCommand, user: ID) -> bool:
-        # check old record with time
-        if await self._is_blocked_expired(user=user, content=content):
-            # command expired, drop it
-            return False
-        task = self._new_blo_task(user=user)
-        return await task.save(value=content)
+        return await self._save_command(BloTask, content=content, user=user)
 
     async def get_block_command(self, user: ID) -> Optional[BlockCommand]:
-        task = self._new_blo_task(user=user)
-        return await task.load()
+        return await self._load(BloTask, user=user)
 
     #
     #   Mute List
     #
 
-    async def _is_muted_expired(self, user: ID, content: MuteCommand) -> bool:
-        """ check old record with command time """
-        new_time = content.time
-        if new_time is None or new_time <= 0:
-            return False
-        # check old record
-        old = await self.get_mute_command(user=user)
-        if old is not None and is_before(old_time=old.time, new_time=new_time):
-            # command expired
-            return False
-
     async def save_mute_command(self, content: MuteCommand, user: ID) -> bool:
-        # check old record with time
-        if await self._is_muted_expired(user=user, content=content):
-            # command expired, drop it
-            return False
-        task = self._new_mut_task(user=user)
-        return await task.save(value=content)
+        return await self._save_command(MutTask, content=content, user=user)
 
     async def get_mute_command(self, user: ID) -> Optional[MuteCommand]:
-        task = self._new_mut_task(user=user)
-        return await task.load()
+        return await self._load(MutTask, user=user)
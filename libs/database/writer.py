@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+# MIT License
+#
+# Copyright (c) 2019 Albert Moky
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ==============================================================================
+
+"""
+    Delayed Writer
+    ~~~~~~~~~~~~~~
+
+    Write-behind queue for the local storage
+"""
+
+import asyncio
+import atexit
+import signal
+import sys
+import threading
+from typing import Any, Callable, Awaitable, Dict, List, Tuple
+
+from ..utils import Singleton, Runner, Logging
+
+
+DiskJob = Callable[[], Awaitable[Any]]
+
+
+@Singleton
+class DelayedWriter(Runner, Logging):
+    """ Save data into local storage in background """
+
+    instance = None  # set when the shared writer created
+
+    def __init__(self):
+        super().__init__(interval=1.0)  # seconds
+        self.__lock = threading.Lock()
+        self.__jobs: Dict[Any, DiskJob] = {}  # key => job
+        self.__closed = False
+        # held while saving, so a flush waits for the jobs already taken
+        self.__busy = threading.Lock()
+        type(self).instance = self
+        # auto start
+        self.start()
+
+    def start(self):
+        thr = Runner.async_thread(coro=self.run())
+        thr.start()
+
+    def put(self, key: Any, job: DiskJob) -> bool:
+        """
+        Schedule a disk write
+
+        :param key: data key, a pending job with the same key will be replaced
+        :param job: function returning the coroutine to save data
+        :return: False when the writer is closed, the caller should save it directly
+        """
+        with self.__lock:
+            if self.__closed:
+                return False
+            self.__jobs[key] = job
+            return True
+
+    def _pop_jobs(self) -> List[Tuple[Any, DiskJob]]:
+        with self.__lock:
+            jobs = self.__jobs
+            self.__jobs = {}
+        return list(jobs.items())
+
+    def _retry_job(self, key: Any, job: DiskJob):
+        with self.__lock:
+            # a newer job for the same key replaces the failed one
+            self.__jobs.setdefault(key, job)
+
+    async def _save_jobs(self) -> Tuple[int, int]:
+        """ run all pending jobs, return counts of (succeeded, failed) """
+        with self.__busy:
+            jobs = self._pop_jobs()
+            if len(jobs) == 0:
+                return 0, 0
+            # jobs for different keys are independent, run them together,
+            # and one failure will not stop the others
+            results = await asyncio.gather(*[job() for _, job in jobs], return_exceptions=True)
+        failed = 0
+        for (key, job), res in zip(jobs, results):
+            if isinstance(res, Exception):
+                self.error('failed to save data: %s, %s', key, res)
+            elif not res:
+                # the storage caught its own error and returned nothing
+                self.error('failed to save data: %s', key)
+            else:
+                continue
+            self._retry_job(key=key, job=job)
+            failed += 1
+        return len(jobs) - failed, failed
+
+    # Override
+    async def process(self) -> bool:
+        succeeded, failed = await self._save_jobs()
+        # failed jobs are back in the queue, wait for next round
+        return succeeded > 0
+
+    async def flush(self):
+        """ save all pending data before shutdown """
+        while True:
+            succeeded, failed = await self._save_jobs()
+            if failed == 0:
+                if succeeded == 0:
+                    # all saved
+                    break
+            elif succeeded == 0:
+                # nothing saved in this round, stop retrying
+                self.error('failed to flush %d job(s)', failed)
+                break
+
+    def close(self):
+        """ stop queueing, then save all pending data (no running event loop required) """
+        with self.__lock:
+            self.__closed = True
+        Runner.sync_run(main=self.flush())
+
+
+def flush_on_exit():
+    """
+        Save pending data whenever the process exits
+
+        Call it from the main thread before running: pending data will be flushed
+        on normal exit and sys.exit(), and SIGTERM is turned into SystemExit,
+        so that 'finally' blocks and the exit hook run too.
+    """
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    atexit.register(_flush_writer)
+
+
+def _exit_on_signal(signum, frame):
+    sys.exit(128 + signum)
+
+
+def _flush_writer():
+    writer = DelayedWriter.instance
+    if writer is None:
+        # never used, nothing to save
+        return
+    writer.close()
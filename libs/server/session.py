@@ -106,7 +106,10 @@ async def session_change_id(session: ServerSession, new_id: ID, old_id: Optional
     if new_id is not None:  # and session.active:
         # store socket address for new user
         Log.info('store socket address for new user: %s, %s', new_id, remote)
-        return await db.add_socket_address(user=new_id, address=remote)
+        addresses = await db.add_socket_address(user=new_id, address=remote)
+        # warm up the user caches before the client asking for them
+        await db.prepare_user(user=new_id)
+        return addresses
 
 
 async def session_change_active(session: ServerSession, active: bool):
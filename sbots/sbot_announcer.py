@@ -56,6 +56,7 @@ from libs.utils import Logging
 from libs.utils import Config
 from libs.common.protocol import ReportCommand, PushCommand
 from libs.database import Database
+from libs.database import flush_on_exit
 
 from libs.client.cpu import ReportCommandProcessor
 from libs.client import ClientProcessor
@@ -67,12 +68,17 @@ from libs.push import AndroidPushNotificationService
 from sbots.shared import GlobalVariable
 from sbots.shared import create_config, start_bot
 from sbots.shared import show_help
+from sbots.shared import ConfigError
 
 
 class PushCommandProcessor(BaseCommandProcessor, Logging):
 
     MESSAGE_EXPIRES = 256
 
+    def __init__(self, facebook: Facebook, messenger: Messenger):
+        super().__init__(facebook=facebook, messenger=messenger)
+        self.__pnc = PushNotificationClient()
+
     # Override
     async def process_content(self, content: Content, r_msg: ReliableMessage) -> List[Content]:
         assert isinstance(content, PushCommand), 'push command error: %s' % content
@@ -86,23 +92,26 @@ class PushCommandProcessor(BaseCommandProcessor, Logging):
         else:
             self.info('push %d item(s) from station: %s.', len(items), sid)
         # add push task
-        pnc = PushNotificationClient()
-        pnc.add_task(content=content)
+        self.__pnc.add_task(content=content)
         return []
 
 
 class BotContentProcessorCreator(ClientContentProcessorCreator):
 
-    # Override
-    def create_command_processor(self, msg_type: str, cmd: str) -> Optional[ContentProcessor]:
+    # cmd => processor class
+    COMMAND_PROCESSORS = {
         # push
-        if cmd == PushCommand.PUSH:
-            return PushCommandProcessor(facebook=self.facebook, messenger=self.messenger)
+        PushCommand.PUSH: PushCommandProcessor,
         # report
-        if cmd == ReportCommand.REPORT:
-            return ReportCommandProcessor(facebook=self.facebook, messenger=self.messenger)
-        elif cmd == 'apns':
-            return ReportCommandProcessor(facebook=self.facebook, messenger=self.messenger)
+        ReportCommand.REPORT: ReportCommandProcessor,
+        'apns': ReportCommandProcessor,
+    }
+
+    # Override
+    def create_command_processor(self, msg_type: str, cmd: str) -> Optional[ContentProcessor]:
+        clazz = self.COMMAND_PROCESSORS.get(cmd)
+        if clazz is not None:
+            return clazz(facebook=self.facebook, messenger=self.messenger)
         # others
         return super().create_command_processor(msg_type=msg_type, cmd=cmd)
 
@@ -155,8 +164,7 @@ async def async_main():
     sys_argv = SysArgvParser.parse(shortopts='hf:ld:',
                                    longopts=['help', 'config=', 'log-location', 'log-dir='])
     if sys_argv is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
+        raise ConfigError('arguments error')
     #
     #  init logger
     #
@@ -167,9 +175,6 @@ async def async_main():
     #  create config
     #
     config = await create_config(sys_argv=sys_argv, default_config=DEFAULT_CONFIG)
-    if config is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
     #
     #  Create push services
     #
@@ -183,7 +188,13 @@ async def async_main():
 
 
 def main():
-    Runner.sync_run(main=async_main())
+    # save pending data into local storage on any exit
+    flush_on_exit()
+    try:
+        Runner.sync_run(main=async_main())
+    except ConfigError:
+        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
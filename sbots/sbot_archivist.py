@@ -53,24 +53,31 @@ from libs.common.protocol import SearchCommand, StorageCommand
 from libs.client.cpu import SearchCommandProcessor, StorageCommandProcessor
 from libs.client import ClientProcessor
 
+from libs.database import flush_on_exit
+
 from sbots.shared import create_config, start_bot
 from sbots.shared import show_help
+from sbots.shared import ConfigError
 
 
 class ArchivistContentProcessorCreator(ClientContentProcessorCreator):
 
-    # Override
-    def create_command_processor(self, msg_type: str, cmd: str) -> Optional[ContentProcessor]:
+    # cmd => processor class
+    COMMAND_PROCESSORS = {
         # search
-        if cmd == SearchCommand.SEARCH:
-            return SearchCommandProcessor(facebook=self.facebook, messenger=self.messenger)
-        elif cmd == SearchCommand.ONLINE_USERS:
-            return SearchCommandProcessor(facebook=self.facebook, messenger=self.messenger)
+        SearchCommand.SEARCH: SearchCommandProcessor,
+        SearchCommand.ONLINE_USERS: SearchCommandProcessor,
         # storage
-        if cmd == StorageCommand.STORAGE:
-            return StorageCommandProcessor(facebook=self.facebook, messenger=self.messenger)
-        elif cmd == StorageCommand.CONTACTS or cmd == StorageCommand.PRIVATE_KEY:
-            return StorageCommandProcessor(facebook=self.facebook, messenger=self.messenger)
+        StorageCommand.STORAGE: StorageCommandProcessor,
+        StorageCommand.CONTACTS: StorageCommandProcessor,
+        StorageCommand.PRIVATE_KEY: StorageCommandProcessor,
+    }
+
+    # Override
+    def create_command_processor(self, msg_type: str, cmd: str) -> Optional[ContentProcessor]:
+        clazz = self.COMMAND_PROCESSORS.get(cmd)
+        if clazz is not None:
+            return clazz(facebook=self.facebook, messenger=self.messenger)
         # others
         return super().create_command_processor(msg_type=msg_type, cmd=cmd)
 
@@ -101,8 +108,7 @@ async def async_main():
     sys_argv = SysArgvParser.parse(shortopts='hf:ld:',
                                    longopts=['help', 'config=', 'log-location', 'log-dir='])
     if sys_argv is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
+        raise ConfigError('arguments error')
     #
     #  init logger
     #
@@ -113,9 +119,6 @@ async def async_main():
     #  create config
     #
     config = await create_config(sys_argv=sys_argv, default_config=DEFAULT_CONFIG)
-    if config is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
     #
     #  Create & start the bot
     #
@@ -124,7 +127,13 @@ async def async_main():
 
 
 def main():
-    Runner.sync_run(main=async_main())
+    # save pending data into local storage on any exit
+    flush_on_exit()
+    try:
+        Runner.sync_run(main=async_main())
+    except ConfigError:
+        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
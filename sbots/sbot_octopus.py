@@ -54,10 +54,13 @@ path = Path.dir(path=path)
 path = Path.dir(path=path)
 Path.add(path=path)
 
+from libs.database import flush_on_exit
+
 from sbots.shared import GlobalVariable
 from sbots.shared import create_config
 from sbots.shared import refresh_neighbors
 from sbots.shared import show_help
+from sbots.shared import ConfigError
 
 
 class InnerClient(Terminal):
@@ -145,8 +148,7 @@ async def async_main():
     sys_argv = SysArgvParser.parse(shortopts='hf:ld:',
                                    longopts=['help', 'config=', 'log-location', 'log-dir='])
     if sys_argv is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
+        raise ConfigError('arguments error')
     #
     #  init logger
     #
@@ -157,9 +159,6 @@ async def async_main():
     #  create config
     #
     config = await create_config(sys_argv=sys_argv, default_config=DEFAULT_CONFIG)
-    if config is None:
-        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
-        sys.exit(1)
     #
     #  login
     #
@@ -182,7 +181,13 @@ async def async_main():
 
 
 def main():
-    Runner.sync_run(main=async_main())
+    # save pending data into local storage on any exit
+    flush_on_exit()
+    try:
+        Runner.sync_run(main=async_main())
+    except ConfigError:
+        show_help(app_name=APP_NAME, cmd=sys.argv[0], default_config=DEFAULT_CONFIG)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -23,10 +23,14 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional
-
-from dimples import ID
-from dimples import Document
+import asyncio
+import os
+import sys
+from typing import Optional, Dict, Tuple
+
+from dimples import DateTime
+from dimples import ID, User
+from dimples import Document, Visa
 from dimples import DocumentUtils
 from dimples.common import AccountDBI, MessageDBI, SessionDBI
 from dimples.common import ServiceProvider
@@ -36,7 +40,7 @@ from dimples.client import ClientChecker
 from libs.utils import SysArgvParser
 from libs.utils import Log
 from libs.utils import Singleton
-from libs.utils import Path, Config
+from libs.utils import Config
 
 from libs.common import ExtensionLoader, LibraryLoader
 from libs.common import CommonFacebook
@@ -52,18 +56,23 @@ from libs.client import Terminal
 @Singleton
 class GlobalVariable:
 
+    # fixed fields, no instance dict
+    __slots__ = ('__config', '__database', '__facebook', '__checker', '__messenger',
+                 '__extensions_loaded', '__prepared')
+
+    VISA_EXPIRES = 3600 * 24  # re-sign visa after 1 day
+
     def __init__(self):
         super().__init__()
         self.__config: Optional[Config] = None
-        self.__adb: Optional[AccountDBI] = None
-        self.__mdb: Optional[MessageDBI] = None
-        self.__sdb: Optional[SessionDBI] = None
-        self.__database: Optional[Database] = None
+        self.__database: Optional[Database] = None  # AccountDBI, MessageDBI & SessionDBI
         self.__facebook: Optional[ClientFacebook] = None
+        self.__checker: Optional[ClientChecker] = None
         self.__messenger: Optional[ClientMessenger] = None
-        # load extensions
-        extensions = ExtensionLoader()
-        LibraryLoader(extensions=extensions).run()
+        # extensions will be loaded when preparing
+        self.__extensions_loaded = False
+        # set after all steps in 'prepare()' succeeded
+        self.__prepared = False
 
     @property
     def config(self) -> Config:
@@ -71,15 +80,15 @@ class GlobalVariable:
 
     @property
     def adb(self) -> AccountDBI:
-        return self.__adb
+        return self.__database
 
     @property
     def mdb(self) -> MessageDBI:
-        return self.__mdb
+        return self.__database
 
     @property
     def sdb(self) -> SessionDBI:
-        return self.__sdb
+        return self.__database
 
     @property
     def database(self) -> Database:
@@ -100,11 +109,23 @@ class GlobalVariable:
         man = SharedGroupManager()
         man.messenger = transceiver
         # set for entity checker
-        checker = self.facebook.checker
-        assert isinstance(checker, ClientChecker), 'entity checker error: %s' % checker
-        checker.messenger = transceiver
+        self.__checker.messenger = transceiver
+
+    def _load_extensions(self):
+        if self.__extensions_loaded:
+            return
+        extensions = ExtensionLoader()
+        LibraryLoader(extensions=extensions).run()
+        self.__extensions_loaded = True
 
     async def prepare(self, config: Config):
+        if self.__prepared:
+            # already prepared, the singletons (dispatcher, push center, ...) are wired
+            if self.__config is not config:
+                Log.warning('GlobalVariable already prepared, ignore config: %s', config)
+            return
+        # load extensions
+        self._load_extensions()
         #
         #  Step 0: load ANS
         #
@@ -117,9 +138,6 @@ class GlobalVariable:
         #  Step 1: create database
         #
         database = await create_database(config=config)
-        self.__adb = database
-        self.__mdb = database
-        self.__sdb = database
         self.__database = database
         await refresh_neighbors(config=config, database=database)
         #
@@ -127,21 +145,43 @@ class GlobalVariable:
         #
         facebook = await create_facebook(database=database)
         self.__facebook = facebook
+        checker = facebook.checker
+        assert isinstance(checker, ClientChecker), 'entity checker error: %s' % checker
+        self.__checker = checker
+        # OK
+        self.__prepared = True
+
+    async def _load_private_keys(self, current_user: ID):
+        facebook = self.facebook
+        # both keys are kept in the same table (same lock), so load them one by one
+        sign_key = await facebook.private_key_for_visa_signature(identifier=current_user)
+        msg_keys = await facebook.private_keys_for_decryption(identifier=current_user)
+        return sign_key, msg_keys
+
+    async def _is_visa_fresh(self, visa: Visa, user: User) -> bool:
+        """ signed recently and still verified by meta.key """
+        when = visa.time
+        if when is None or DateTime.current_timestamp() - when > self.VISA_EXPIRES:
+            return False
+        return await user.verify_visa(visa=visa)
 
     async def login(self, current_user: ID):
         facebook = self.facebook
         archivist = facebook.archivist
+        # load private keys & user (meta, documents) together
+        (sign_key, msg_keys), user = await asyncio.gather(
+            self._load_private_keys(current_user=current_user),
+            facebook.get_user(identifier=current_user)
+        )
         # make sure private keys exists
-        sign_key = await facebook.private_key_for_visa_signature(identifier=current_user)
-        msg_keys = await facebook.private_keys_for_decryption(identifier=current_user)
         assert sign_key is not None, 'failed to get sign key for current user: %s' % current_user
         assert len(msg_keys) > 0, 'failed to get msg keys: %s' % current_user
         Log.warning('set current user: %s', current_user)
-        user = await facebook.get_user(identifier=current_user)
         assert user is not None, 'failed to get current user: %s' % current_user
+        # the visa depends on the user, so it is loaded after
         docs = await user.documents
         visa = DocumentUtils.last_visa(documents=docs)
-        if visa is not None:
+        if visa is not None and not await self._is_visa_fresh(visa=visa, user=user):
             # refresh visa
             visa = Document.parse(document=visa.copy_map())
             visa.sign(private_key=sign_key)
@@ -168,37 +208,69 @@ async def create_facebook(database: AccountDBI) -> ClientFacebook:
 
 
 def show_help(app_name: str, cmd: str, default_config: str):
-    print('')
-    print('    %s' % app_name)
-    print('')
-    print('usages:')
-    print('    %s [--config=<FILE>]' % cmd)
-    print('    %s [-h|--help]' % cmd)
-    print('')
-    print('optional arguments:')
-    print('    --config        config file path (default: "%s")' % default_config)
-    print('    --help, -h      show this help message and exit')
-    print('')
-
-
-async def create_config(sys_argv: SysArgvParser, default_config: str) -> Optional[Config]:
-    """ load config """
+    sys.stdout.write(
+        '\n'
+        '    %s\n'
+        '\n'
+        'usages:\n'
+        '    %s [--config=<FILE>]\n'
+        '    %s [-h|--help]\n'
+        '\n'
+        'optional arguments:\n'
+        '    --config        config file path (default: "%s")\n'
+        '    --help, -h      show this help message and exit\n'
+        '\n' % (app_name, cmd, cmd, default_config)
+    )
+
+
+# (ini_file, mtime) => config
+_config_cache: Dict[Tuple[str, float], Config] = {}
+
+
+async def load_config(ini_file: str) -> Config:
+    """ load config from INI file, reuse it if the file not changed """
+    key = (ini_file, os.stat(ini_file).st_mtime)
+    config = _config_cache.get(key)
+    if config is None:
+        config = Config()
+        await config.load(path=ini_file)
+        Log.warning('>>> config loaded: %s => %s', ini_file, config)
+        _config_cache[key] = config
+    return config
+
+
+def get_config_file(sys_argv: SysArgvParser, default_config: str) -> Optional[str]:
+    """ get INI file from '--config=<FILE>' or '-f <FILE>', None for '-h|--help' """
+    ini_file = default_config
+    for key, value in sys_argv.opts:
+        if key == '-h' or key == '--help':
+            return None
+        elif key == '-f' or key == '--config':
+            ini_file = value
+    return ini_file
+
+
+class ConfigError(Exception):
+    """ Bad command line arguments or config file """
+    pass
+
+
+async def create_config(sys_argv: SysArgvParser, default_config: str) -> Config:
+    """ load config, raise ConfigError when failed """
     #
     #  get INI file
     #
-    ini_file = sys_argv.get_opt(opt='config')
+    ini_file = get_config_file(sys_argv=sys_argv, default_config=default_config)
     if ini_file is None:
-        ini_file = default_config
-    if not await Path.exists(path=ini_file):
+        raise ConfigError('help requested')
+    if not os.path.exists(ini_file):
         Log.error('!!! config file not exists: %s', ini_file)
-        return None
+        raise ConfigError('config file not exists: %s' % ini_file)
     shared = GlobalVariable()
     #
     #  load config
     #
-    config = Config()
-    await config.load(path=ini_file)
-    Log.warning('>>> config loaded: %s => %s', ini_file, config)
+    config = await load_config(ini_file=ini_file)
     await shared.prepare(config=config)
     return config
 
@@ -210,29 +282,27 @@ async def refresh_neighbors(config: Config, database: SessionDBI):
     if len(neighbors) > 0:
         Log.info('[DB] checking %d neighbor(s): %s', len(neighbors), provider)
         # await sdb.remove_stations(provider=provider)
-        # 1. remove vanished neighbors
         old_stations = await database.all_stations(provider=provider)
-        for old in old_stations:
-            found = False
-            for item in neighbors:
-                if item.port == old.port and item.host == old.host:
-                    found = True
-                    break
-            if not found:
-                Log.warning('[DB] removing neighbor station: %s', old)
-                await database.remove_station(host=old.host, port=old.port, provider=provider)
+        old_nodes = {(old.host, old.port): old for old in old_stations}
+        new_nodes = {(node.host, node.port): node for node in neighbors}
+        old_keys = frozenset(old_nodes)
+        new_keys = frozenset(new_nodes)
+        removed = []
+        added = []
+        # 1. remove vanished neighbors
+        for key in old_keys - new_keys:
+            Log.debug('[DB] removing neighbor station: %s', old_nodes[key])
+            await database.remove_station(host=key[0], port=key[1], provider=provider)
+            removed.append(key)
         # 2. add new neighbors
-        for node in neighbors:
-            found = False
-            for old in old_stations:
-                if old.port == node.port and old.host == node.host:
-                    found = True
-                    break
-            if found:
-                Log.info('[DB] neighbor node exists: %s', node)
+        for key, node in new_nodes.items():  # keep the order in config
+            if key in old_keys:
+                Log.debug('[DB] neighbor node exists: %s', node)
             else:
-                Log.info('[DB] adding neighbor node: %s', node)
+                Log.debug('[DB] adding neighbor node: %s', node)
                 await database.add_station(identifier=None, host=node.host, port=node.port, provider=provider)
+                added.append(key)
+        Log.info('[DB] neighbors refreshed: +%d -%d, added: %s, removed: %s', len(added), len(removed), added, removed)
     # OK
     return neighbors
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 
 exec=python3
+timeout=10  # seconds to wait before kill -9
 
 function stop() {
     res=$(pgrep -f "${exec} .*$1")
@@ -10,7 +11,18 @@ function stop() {
         if [[ $((pid)) -gt 1 ]]
         then
             echo "stopping $1 ($((pid)))"
-            kill -9 $((pid))
+            # SIGTERM first, let it save pending data into local storage
+            kill -TERM $((pid))
+            for _ in $(seq 1 ${timeout})
+            do
+                kill -0 $((pid)) 2>/dev/null || break
+                sleep 1
+            done
+            if kill -0 $((pid)) 2>/dev/null
+            then
+                echo "killing $1 ($((pid)))"
+                kill -9 $((pid))
+            fi
         fi
     done
 }
@@ -23,17 +23,21 @@
 # SOFTWARE.
 # ==============================================================================
 
-from typing import Optional
+import asyncio
+import os
+import time
+from typing import Optional, Dict, Tuple
 
-from dimples import ID
-from dimples import Document
+from dimples import DateTime
+from dimples import ID, User
+from dimples import Document, Visa
 from dimples import DocumentUtils
 from dimples import AccountDBI, MessageDBI, SessionDBI
 from dimples.common import ServiceProvider
 from dimples.group import SharedGroupManager
 
 from libs.utils import SysArgvParser
-from libs.utils import Path, Log
+from libs.utils import Log
 from libs.utils import Singleton
 from libs.utils import Config
 from libs.common import ExtensionLoader, LibraryLoader
@@ -55,19 +59,26 @@ from libs.server import ServerEmitter, Monitor
 @Singleton
 class GlobalVariable:
 
+    # fixed fields, no instance dict
+    __slots__ = ('__config', '__database', '__facebook', '__checker', '__messenger', '__emitter',
+                 '__extensions_loaded', '__prepared')
+
+    WARMUP_TIMEOUT = 30  # seconds, warn when warmup takes longer
+
+    VISA_EXPIRES = 3600 * 24  # re-sign visa after 1 day
+
     def __init__(self):
         super().__init__()
         self.__config: Optional[Config] = None
-        self.__adb: Optional[AccountDBI] = None
-        self.__mdb: Optional[MessageDBI] = None
-        self.__sdb: Optional[SessionDBI] = None
-        self.__database: Optional[Database] = None
+        self.__database: Optional[Database] = None  # AccountDBI, MessageDBI & SessionDBI
         self.__facebook: Optional[ServerFacebook] = None
+        self.__checker: Optional[ServerChecker] = None
         self.__messenger: Optional[ServerMessenger] = None  # only for entity checker
         self.__emitter: Optional[ServerEmitter] = None
-        # load extensions
-        extensions = ExtensionLoader()
-        LibraryLoader(extensions=extensions).run()
+        # extensions will be loaded when preparing
+        self.__extensions_loaded = False
+        # set after all steps in 'prepare()' succeeded
+        self.__prepared = False
 
     @property
     def config(self) -> Config:
@@ -75,15 +86,15 @@ class GlobalVariable:
 
     @property
     def adb(self) -> AccountDBI:
-        return self.__adb
+        return self.__database
 
     @property
     def mdb(self) -> MessageDBI:
-        return self.__mdb
+        return self.__database
 
     @property
     def sdb(self) -> SessionDBI:
-        return self.__sdb
+        return self.__database
 
     @property
     def database(self) -> Database:
@@ -104,11 +115,23 @@ class GlobalVariable:
         man = SharedGroupManager()
         man.messenger = transceiver
         # set for entity checker
-        checker = self.facebook.checker
-        assert isinstance(checker, ServerChecker), 'entity checker error: %s' % checker
-        checker.messenger = transceiver
+        self.__checker.messenger = transceiver
+
+    def _load_extensions(self):
+        if self.__extensions_loaded:
+            return
+        extensions = ExtensionLoader()
+        LibraryLoader(extensions=extensions).run()
+        self.__extensions_loaded = True
 
     async def prepare(self, config: Config):
+        if self.__prepared:
+            # already prepared, the singletons (dispatcher, push center, ...) are wired
+            if self.__config is not config:
+                Log.warning('GlobalVariable already prepared, ignore config: %s', config)
+            return
+        # load extensions
+        self._load_extensions()
         #
         #  Step 0: load ANS
         #
@@ -121,9 +144,6 @@ class GlobalVariable:
         #  Step 1: create database
         #
         database = await create_database(config=config)
-        self.__adb = database
-        self.__mdb = database
-        self.__sdb = database
         self.__database = database
         await refresh_neighbors(config=config, database=database)
         #
@@ -131,6 +151,9 @@ class GlobalVariable:
         #
         facebook = await create_facebook(database=database)
         self.__facebook = facebook
+        checker = facebook.checker
+        assert isinstance(checker, ServerChecker), 'entity checker error: %s' % checker
+        self.__checker = checker
         #
         #  Step 3: prepare dispatcher
         #
@@ -149,9 +172,9 @@ class GlobalVariable:
         # this messenger is only for encryption, so don't need a session
         emitter = ServerEmitter(messenger=messenger)
         self.__emitter = emitter
-        # server check don't need a session to send message too
-        checker = facebook.checker
-        assert isinstance(checker, ServerChecker), 'entity checker error: %s' % checker
+        # server check don't need a session to send message too,
+        # so share this messenger with the entity checker
+        self.__messenger = messenger
         checker.messenger = messenger
         #
         #  Step 5: prepare push center
@@ -163,21 +186,84 @@ class GlobalVariable:
         #
         monitor = Monitor()
         monitor.emitter = emitter
+        # OK
+        self.__prepared = True
+
+    async def warmup(self):
+        """ load hot data into memory caches before accepting connections """
+        config = self.config
+        # the getters log errors for missing options, so check the options first
+        options = config.to_map().get('warmup')
+        if options is None:
+            options = {}
+        if 'enable' in options and config.get_boolean(section='warmup', option='enable') is False:
+            Log.info('warmup disabled')
+            return False
+        timeout = None
+        if 'timeout' in options:
+            timeout = config.get_integer(section='warmup', option='timeout')
+        if timeout is None or timeout <= 0:
+            timeout = self.WARMUP_TIMEOUT
+        # NOTICE: the loads are synchronous inside the coroutines, so they cannot
+        #         be interrupted; the timeout only reports a slow warmup
+        start = time.time()
+        await self._warmup()
+        elapsed = time.time() - start
+        if elapsed > timeout:
+            Log.warning('warmup took %.3f seconds, more than %d', elapsed, timeout)
+        return True
+
+    async def _warmup(self):
+        database = self.database
+        facebook = self.facebook
+        #  1. stations & providers (same table, load one by one)
+        await database.all_providers()
+        await database.all_stations(provider=ServiceProvider.GSP)
+        #  2. service bots from ANS
+        records = self.config.ans_records
+        if records is None:
+            return
+        bots = set()
+        for value in records.values():
+            identifier = ID.parse(identifier=value)
+            if identifier is not None:
+                bots.add(identifier)
+        for identifier in bots:
+            await facebook.get_meta(identifier=identifier)
+            await facebook.get_documents(identifier=identifier)
+        Log.info('warmup finished: %d bot(s)', len(bots))
+
+    async def _load_private_keys(self, current_user: ID):
+        facebook = self.facebook
+        # both keys are kept in the same table (same lock), so load them one by one
+        sign_key = await facebook.private_key_for_visa_signature(identifier=current_user)
+        msg_keys = await facebook.private_keys_for_decryption(identifier=current_user)
+        return sign_key, msg_keys
+
+    async def _is_visa_fresh(self, visa: Visa, user: User) -> bool:
+        """ signed recently and still verified by meta.key """
+        when = visa.time
+        if when is None or DateTime.current_timestamp() - when > self.VISA_EXPIRES:
+            return False
+        return await user.verify_visa(visa=visa)
 
     async def login(self, current_user: ID):
         facebook = self.facebook
         archivist = facebook.archivist
+        # load private keys & user (meta, documents) together
+        (sign_key, msg_keys), user = await asyncio.gather(
+            self._load_private_keys(current_user=current_user),
+            facebook.get_user(identifier=current_user)
+        )
         # make sure private keys exists
-        sign_key = await facebook.private_key_for_visa_signature(identifier=current_user)
-        msg_keys = await facebook.private_keys_for_decryption(identifier=current_user)
         assert sign_key is not None, 'failed to get sign key for current user: %s' % current_user
         assert len(msg_keys) > 0, 'failed to get msg keys: %s' % current_user
         Log.info('set current user: %s', current_user)
-        user = await facebook.get_user(identifier=current_user)
         assert user is not None, 'failed to get current user: %s' % current_user
+        # the visa depends on the user, so it is loaded after
         docs = await user.documents
         visa = DocumentUtils.last_visa(documents=docs)
-        if visa is not None:
+        if visa is not None and not await self._is_visa_fresh(visa=visa, user=user):
             # refresh visa
             visa = Document.parse(document=visa.copy_map())
             visa.sign(private_key=sign_key)
@@ -224,24 +310,54 @@ def create_messenger(facebook: CommonFacebook, database: MessageDBI,
     return messenger
 
 
-async def create_config(sys_argv: SysArgvParser, default_config: str) -> Optional[Config]:
-    """ load config """
+# (ini_file, mtime) => config
+_config_cache: Dict[Tuple[str, float], Config] = {}
+
+
+async def load_config(ini_file: str) -> Config:
+    """ load config from INI file, reuse it if the file not changed """
+    key = (ini_file, os.stat(ini_file).st_mtime)
+    config = _config_cache.get(key)
+    if config is None:
+        config = Config()
+        await config.load(path=ini_file)
+        Log.warning('>>> config loaded: %s => %s', ini_file, config)
+        _config_cache[key] = config
+    return config
+
+
+def get_config_file(sys_argv: SysArgvParser, default_config: str) -> Optional[str]:
+    """ get INI file from '--config=<FILE>' or '-f <FILE>', None for '-h|--help' """
+    ini_file = default_config
+    for key, value in sys_argv.opts:
+        if key == '-h' or key == '--help':
+            return None
+        elif key == '-f' or key == '--config':
+            ini_file = value
+    return ini_file
+
+
+class ConfigError(Exception):
+    """ Bad command line arguments or config file """
+    pass
+
+
+async def create_config(sys_argv: SysArgvParser, default_config: str) -> Config:
+    """ load config, raise ConfigError when failed """
     #
     #  get INI file
     #
-    ini_file = sys_argv.get_opt(opt='config')
+    ini_file = get_config_file(sys_argv=sys_argv, default_config=default_config)
     if ini_file is None:
-        ini_file = default_config
-    if not await Path.exists(path=ini_file):
+        raise ConfigError('help requested')
+    if not os.path.exists(ini_file):
         Log.error('!!! config file not exists: %s', ini_file)
-        return None
+        raise ConfigError('config file not exists: %s' % ini_file)
     shared = GlobalVariable()
     #
     #  load config
     #
-    config = Config()
-    await config.load(path=ini_file)
-    Log.warning('>>> config loaded: %s => %s', ini_file, config)
+    config = await load_config(ini_file=ini_file)
     await shared.prepare(config=config)
     return config
 
@@ -253,28 +369,26 @@ async def refresh_neighbors(config: Config, database: SessionDBI):
     if len(neighbors) > 0:
         Log.info('[DB] checking %d neighbor(s): %s', len(neighbors), provider)
         # await sdb.remove_stations(provider=provider)
-        # 1. remove vanished neighbors
         old_stations = await database.all_stations(provider=provider)
-        for old in old_stations:
-            found = False
-            for item in neighbors:
-                if item.port == old.port and item.host == old.host:
-                    found = True
-                    break
-            if not found:
-                Log.warning('[DB] removing neighbor station: %s', old)
-                await database.remove_station(host=old.host, port=old.port, provider=provider)
+        old_nodes = {(old.host, old.port): old for old in old_stations}
+        new_nodes = {(node.host, node.port): node for node in neighbors}
+        old_keys = frozenset(old_nodes)
+        new_keys = frozenset(new_nodes)
+        removed = []
+        added = []
+        # 1. remove vanished neighbors
+        for key in old_keys - new_keys:
+            Log.debug('[DB] removing neighbor station: %s', old_nodes[key])
+            await database.remove_station(host=key[0], port=key[1], provider=provider)
+            removed.append(key)
         # 2. add new neighbors
-        for node in neighbors:
-            found = False
-            for old in old_stations:
-                if old.port == node.port and old.host == node.host:
-                    found = True
-                    break
-            if found:
-                Log.info('[DB] neighbor node exists: %s', node)
+        for key, node in new_nodes.items():  # keep the order in config
+            if key in old_keys:
+                Log.debug('[DB] neighbor node exists: %s', node)
             else:
-                Log.info('[DB] adding neighbor node: %s', node)
+                Log.debug('[DB] adding neighbor node: %s', node)
                 await database.add_station(identifier=None, host=node.host, port=node.port, provider=provider)
+                added.append(key)
+        Log.info('[DB] neighbors refreshed: +%d -%d, added: %s, removed: %s', len(added), len(removed), added, removed)
     # OK
     return neighbors
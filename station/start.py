@@ -46,9 +46,12 @@ path = Path.dir(path=path)
 Path.add(path=path)
 
 from libs.utils.mtp import Server as UDPServer
+from libs.database import DelayedWriter
+from libs.database import flush_on_exit
 
 from station.shared import GlobalVariable
 from station.shared import create_config
+from station.shared import ConfigError
 from station.handler import RequestHandler
 
 
@@ -65,17 +68,19 @@ DEFAULT_CONFIG = '/etc/dim/station.ini'
 
 def show_help():
     cmd = sys.argv[0]
-    print('')
-    print('    %s' % APP_NAME)
-    print('')
-    print('usages:')
-    print('    %s [--config=<FILE>]' % cmd)
-    print('    %s [-h|--help]' % cmd)
-    print('')
-    print('optional arguments:')
-    print('    --config        config file path (default: "%s")' % DEFAULT_CONFIG)
-    print('    --help, -h      show this help message and exit')
-    print('')
+    sys.stdout.write(
+        '\n'
+        '    %s\n'
+        '\n'
+        'usages:\n'
+        '    %s [--config=<FILE>]\n'
+        '    %s [-h|--help]\n'
+        '\n'
+        'optional arguments:\n'
+        '    --config        config file path (default: "%s")\n'
+        '    --help, -h      show this help message and exit\n'
+        '\n' % (APP_NAME, cmd, cmd, DEFAULT_CONFIG)
+    )
 
 
 async def async_main():
@@ -85,8 +90,7 @@ async def async_main():
     sys_argv = SysArgvParser.parse(shortopts='hf:ld:',
                                    longopts=['help', 'config=', 'log-location', 'log-dir='])
     if sys_argv is None:
-        show_help()
-        sys.exit(1)
+        raise ConfigError('arguments error')
     #
     #  init logger
     #
@@ -97,15 +101,13 @@ async def async_main():
     #  create config
     #
     config = await create_config(sys_argv=sys_argv, default_config=DEFAULT_CONFIG)
-    if config is None:
-        show_help()
-        sys.exit(1)
     #
     #  login
     #
     sid = config.station_id
     shared = GlobalVariable()
     await shared.login(current_user=sid)
+    await shared.warmup()
     #
     #  Station host & port
     #
@@ -137,11 +139,19 @@ async def async_main():
         Log.info('~~~~~~~~ %s', ex)
     finally:
         g_udp_server.stop()
+        # save pending data into local storage
+        await DelayedWriter().flush()
         Log.info('======== station shutdown!')
 
 
 def main():
-    Runner.sync_run(main=async_main())
+    # save pending data into local storage on any exit (SIGTERM included)
+    flush_on_exit()
+    try:
+        Runner.sync_run(main=async_main())
+    except ConfigError:
+        show_help()
+        sys.exit(1)
 
 
 if __name__ == '__main__':